@@ -25,7 +25,7 @@ export class SyncController {
     return candidates[0];
   }
 
-  private buildProcess(scriptPath: string, source?: string, dest?: string, tables: string[] = [], resume?: string, statePathOverride?: string) {
+  private buildProcess(scriptPath: string, source?: string, dest?: string, tables: string[] = [], resume?: string, statePathOverride?: string, extraArgs: string[] = []) {
     const env = {
       ...process.env,
       SYNC_TABLES: tables.join(','),
@@ -46,6 +46,7 @@ export class SyncController {
         ? statePathOverride.trim()
         : path.join(path.dirname(scriptPath), 'sync-state.json');
       args.push('--state', statePath);
+      args.push(...extraArgs);
       return { cmd: pythonCmd, args, env };
     }
     // Default to PowerShell
@@ -73,6 +74,15 @@ export class SyncController {
     @Query('resume') resume?: string,
     @Query('state') statePathOverride?: string,
     @Query('keys') keysJson?: string,
+    @Query('key') keyCol?: string,
+    @Query('delimiter') delimiter?: string,
+    @Query('encoding') encoding?: string,
+    @Query('chunkSize') chunkSize?: string,
+    @Query('where') where?: string | string[],
+    @Query('columns') columns?: string | string[],
+    @Query('filters') filtersPath?: string,
+    @Query('verify') verify?: string,
+    @Query('repair') repair?: string,
   ) {
     // Prepare SSE response
     res.setHeader('Content-Type', 'text/event-stream');
@@ -101,7 +111,26 @@ export class SyncController {
 
     // Emit a clean startup info with proper accents
     send('info', { message: `Démarrage de la synchronisation`, script: scriptPath, source, dest, tables });
-    const build = this.buildProcess(scriptPath, source, dest, tables, resume, statePathOverride);
+    // Options understood by sync_cma.py only (file sources, per-table filters)
+    const extraArgs: string[] = [];
+    // where/columns are "Table:value" and may be repeated once per table
+    for (const w of ([] as string[]).concat(where || [])) { if (w.trim()) extraArgs.push('--where', w.trim()); }
+    for (const c of ([] as string[]).concat(columns || [])) { if (c.trim()) extraArgs.push('--columns', c.trim()); }
+    if (filtersPath && filtersPath.trim()) { extraArgs.push('--filters', filtersPath.trim()); }
+    if (repair && /^(1|true|yes|on)$/i.test(repair.trim())) { extraArgs.push('--repair'); }
+    else if (verify && /^(1|true|yes|on)$/i.test(verify.trim())) { extraArgs.push('--verify'); }
+    if (keyCol && keyCol.trim()) { extraArgs.push('--key', keyCol.trim()); }
+    if (delimiter) { extraArgs.push('--delimiter', delimiter); }
+    if (encoding && encoding.trim()) { extraArgs.push('--encoding', encoding.trim()); }
+    if (chunkSize && chunkSize.trim()) { extraArgs.push('--chunk-size', chunkSize.trim()); }
+    // The PowerShell fallback would ignore these and run a full, unfiltered, writing sync
+    if (extraArgs.length && path.extname(scriptPath).toLowerCase() !== '.py') {
+      send('error', { message: `Options non prises en charge par ${path.basename(scriptPath)} (sync_cma.py requis): ${extraArgs.filter((a) => a.startsWith('--')).join(' ')}` });
+      send('done', { code: -1 });
+      res.end();
+      return;
+    }
+    const build = this.buildProcess(scriptPath, source, dest, tables, resume, statePathOverride, extraArgs);
     const child = spawn(build.cmd, build.args, {
       windowsHide: true,
       env: build.env,
@@ -1,10 +1,15 @@
 ﻿#!/usr/bin/env python3
 import sys
 import os
+import bisect
+import codecs
+import csv
+import hashlib
 import json
 import re
-from datetime import datetime
-from typing import List, Dict, Tuple, Any, Optional
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Dict, Tuple, Any, Optional, Iterator, Union
 
 try:
     import pyodbc  # type: ignore
@@ -30,6 +35,121 @@ def connect_access(path: str) -> pyodbc.Connection:
     return pyodbc.connect(conn_str, autocommit=False)
 
 
+_FILE_SOURCE_EXTS = {
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".txt": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+_INT_TEXT_RE = re.compile(r"^-?(0|[1-9]\d*)$")
+
+
+def is_file_source(path: str) -> bool:
+    return os.path.splitext(path or "")[1].lower() in _FILE_SOURCE_EXTS
+
+
+class FileSource:
+    """
+    Streaming source over a delimited (CSV/TSV) or NDJSON file, used in place
+    of an Access connection for reference data such as df_wilaya.csv.
+    The column plan comes from the header line (or the first NDJSON record);
+    rows are read lazily in chunks so large files are never fully loaded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        delimiter: Optional[str] = None,
+        encoding: Optional[str] = None,
+        chunk_size: int = 1000,
+    ) -> None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Source file not found: {path}")
+        self.path = path
+        self.fmt = _FILE_SOURCE_EXTS.get(os.path.splitext(path)[1].lower(), "csv")
+        # utf-8-sig transparently strips the BOM Excel puts in front of exports
+        self.encoding = encoding or "utf-8-sig"
+        self.chunk_size = max(1, int(chunk_size or 1000))
+        self.delimiter = delimiter or (self._detect_delimiter() if self.fmt == "csv" else None)
+        self._columns: Optional[List[str]] = None
+
+    def _detect_delimiter(self) -> str:
+        if os.path.splitext(self.path)[1].lower() == ".tsv":
+            return "\t"
+        with open(self.path, "r", encoding=self.encoding, newline="") as f:
+            header = f.readline()
+        counts = {d: header.count(d) for d in (";", ",", "\t", "|")}
+        best = max(counts, key=lambda d: counts[d])
+        return best if counts[best] > 0 else ","
+
+    def columns(self) -> List[Tuple[str, int]]:
+        if self._columns is None:
+            names: List[str] = []
+            with open(self.path, "r", encoding=self.encoding, newline="") as f:
+                if self.fmt == "ndjson":
+                    for line in f:
+                        if line.strip():
+                            names = [str(k) for k in json.loads(line).keys()]
+                            break
+                else:
+                    header = next(csv.reader(f, delimiter=self.delimiter), [])
+                    names = [h.strip() for h in header]
+            self._columns = [n for n in names if n]
+        # File columns carry no driver type information
+        return [(c, 0) for c in self._columns]
+
+    @staticmethod
+    def _coerce_text(val: str) -> Any:
+        # Mirror what the Access driver would return: empty -> NULL and plain
+        # integers as int (so ids are not caught by the boolean heuristics).
+        # Zero-padded codes are kept as text.
+        if val == "":
+            return None
+        sv = val.strip()
+        if _INT_TEXT_RE.match(sv):
+            return int(sv)
+        return val
+
+    def iter_chunks(self, cols: List[str]) -> Iterator[List[Dict[str, Any]]]:
+        chunk: List[Dict[str, Any]] = []
+        with open(self.path, "r", encoding=self.encoding, newline="") as f:
+            if self.fmt == "ndjson":
+                for line in f:
+                    if not line.strip():
+                        continue
+                    rec = json.loads(line)
+                    chunk.append({c: rec.get(c) for c in cols})
+                    if len(chunk) >= self.chunk_size:
+                        yield chunk
+                        chunk = []
+            else:
+                reader = csv.reader(f, delimiter=self.delimiter)
+                header = [h.strip() for h in next(reader, [])]
+                pos = {name: i for i, name in enumerate(header)}
+                for rec in reader:
+                    if not rec:
+                        continue
+                    row: Dict[str, Any] = {}
+                    for c in cols:
+                        i = pos.get(c)
+                        row[c] = self._coerce_text(rec[i]) if i is not None and i < len(rec) else None
+                    chunk.append(row)
+                    if len(chunk) >= self.chunk_size:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+
+    def iter_rows(self, cols: List[str]) -> Iterator[Dict[str, Any]]:
+        for chunk in self.iter_chunks(cols):
+            for row in chunk:
+                yield row
+
+    def close(self) -> None:
+        pass
+
+
 def get_columns(conn: pyodbc.Connection, table: str) -> List[Tuple[str, int]]:
     """
     Returns list of (name, type_code) for columns in table.
@@ -92,8 +212,18 @@ def get_columns(conn: pyodbc.Connection, table: str) -> List[Tuple[str, int]]:
     return cols
 
 
-def fetch_all(conn: pyodbc.Connection, table: str, cols: List[str]) -> List[Dict[str, Any]]:
+def where_clause(where: Optional[str]) -> str:
+    return f" WHERE ({where})" if where else ""
+
+
+def fetch_all(
+    conn: pyodbc.Connection,
+    table: str,
+    cols: List[str],
+    where: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     cur = conn.cursor()
+    where_sql = where_clause(where)
     def run_select(select_sql: str, alias_map: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
         cur.execute(select_sql)
         rows = cur.fetchall()
@@ -110,7 +240,7 @@ def fetch_all(conn: pyodbc.Connection, table: str, cols: List[str]) -> List[Dict
     try:
         sel = ", ".join(q(c) for c in cols)
         try:
-            return run_select(f"SELECT {sel} FROM {q(table)}")
+            return run_select(f"SELECT {sel} FROM {q(table)}{where_sql}")
         except pyodbc.DataError as e:
             msg = str(e)
             # Fallback for invalid datetime values: coerce bad dates to NULL
@@ -130,7 +260,7 @@ def fetch_all(conn: pyodbc.Connection, table: str, cols: List[str]) -> List[Dict
                         exprs.append(q(c))
                 safe_sel = ", ".join(exprs)
                 try:
-                    return run_select(f"SELECT {safe_sel} FROM {q(table)}", alias_map)
+                    return run_select(f"SELECT {safe_sel} FROM {q(table)}{where_sql}", alias_map)
                 except pyodbc.DataError:
                     # Last resort: coerce every column to text and fetch as strings
                     exprs2: List[str] = []
@@ -140,7 +270,7 @@ def fetch_all(conn: pyodbc.Connection, table: str, cols: List[str]) -> List[Dict
                         exprs2.append(f"({q(c)} & '') AS {q(alias)}")
                         alias_map2[alias] = c
                     all_txt_sel = ", ".join(exprs2)
-                    return run_select(f"SELECT {all_txt_sel} FROM {q(table)}", alias_map2)
+                    return run_select(f"SELECT {all_txt_sel} FROM {q(table)}{where_sql}", alias_map2)
             raise
     finally:
         try:
@@ -273,6 +403,40 @@ def save_state(path: str, data: Dict[str, Any]) -> None:
         pass
 
 
+def state_key(table: str, where: Optional[str] = None, columns: Optional[List[str]] = None) -> str:
+    """
+    Key of a table entry in the resume state. Unfiltered syncs keep the plain
+    table name; filtered or projected syncs get their own entry so that their
+    progress never hides rows from a later full sync.
+    """
+    parts = [table]
+    if where:
+        parts.append(f"where={where}")
+    if columns:
+        parts.append("columns=" + ",".join(columns))
+    return "|".join(parts)
+
+
+def load_table_filters(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads a JSON filter file of the form
+      {"Titres": {"where": "[idAntenne]=3", "columns": ["id", "Code"]}}
+    and returns it keyed by lower-cased table name.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        raw = json.load(f)
+    filters: Dict[str, Dict[str, Any]] = {}
+    if isinstance(raw, dict):
+        for table, spec in raw.items():
+            if not isinstance(spec, dict):
+                continue
+            cols = spec.get('columns') or []
+            if isinstance(cols, str):
+                cols = [c.strip() for c in cols.split(',') if c.strip()]
+            filters[str(table).lower()] = {'where': spec.get('where') or None, 'columns': list(cols)}
+    return filters
+
+
 def detect_natural_keys(table: str, dest_cols: List[str]) -> List[List[str]]:
     upper = {c.lower() for c in dest_cols}
     if table.lower() == "typestitres":
@@ -299,6 +463,7 @@ def build_dest_nk_index(
     table: str,
     key_col: str,
     nk_combos: List[List[str]],
+    where: Optional[str] = None,
 ) -> Tuple[Dict[str, Any], Dict[Tuple[int, Tuple[str, ...]], Any]]:
     dest_ids = {}
     nk_map: Dict[Tuple[int, Tuple[str, ...]], Any] = {}
@@ -313,7 +478,7 @@ def build_dest_nk_index(
     cur = conn.cursor()
     try:
         sel = ", ".join(q(c) for c in cols)
-        cur.execute(f"SELECT {sel} FROM {q(table)}")
+        cur.execute(f"SELECT {sel} FROM {q(table)}{where_clause(where)}")
         names = [d[0] for d in cur.description]
         idx_key = names.index(key_col)
         all_rows = cur.fetchall()
@@ -338,7 +503,46 @@ def build_dest_nk_index(
     return dest_ids, nk_map
 
 
-def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, state_path: Optional[str] = None) -> int:
+def open_source(source: str, source_opts: Optional[Dict[str, Any]] = None) -> Union[pyodbc.Connection, FileSource]:
+    if is_file_source(source):
+        opts = source_opts or {}
+        src = FileSource(
+            source,
+            delimiter=opts.get("delimiter"),
+            encoding=opts.get("encoding"),
+            chunk_size=opts.get("chunk_size") or 1000,
+        )
+        log_info(f"  File source ({src.fmt}, encoding={src.encoding}, chunk={src.chunk_size})")
+        return src
+    return connect_access(source)
+
+
+def plan_columns(src_cols: List[str], dst_cols: List[str], key_col: str, projection: List[str]) -> List[str]:
+    common = [c for c in dst_cols if c in src_cols]
+    if projection:
+        # The key column is always kept so rows can still be matched
+        wanted = {c.lower() for c in projection} | {key_col.lower()}
+        missing = [c for c in projection if c.lower() not in {x.lower() for x in common}]
+        if missing:
+            raise ValueError("projected column(s) not in both tables: " + ", ".join(missing))
+        common = [c for c in common if c.lower() in wanted]
+        if not [c for c in common if c.lower() != key_col.lower()]:
+            raise ValueError("projection leaves no column besides the key")
+    return common
+
+
+def run_sync(
+    source: str,
+    dest: str,
+    tables: List[str],
+    resume: bool = False,
+    state_path: Optional[str] = None,
+    key_col: str = "id",
+    source_opts: Optional[Dict[str, Any]] = None,
+    table_filters: Optional[Dict[str, Dict[str, Any]]] = None,
+    save_progress: bool = True,
+    only_keys: Optional[Dict[str, List[int]]] = None,
+) -> int:
     script_path = os.path.abspath(__file__)
     log_info(f"[INFO] DÃ©marrage de la synchronisation ({script_path})")
     # Print a clean startup banner with proper accents
@@ -346,24 +550,41 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
     log_info(f"Source : {source}")
     log_info(f"Destination : {dest}")
 
-    src = connect_access(source)
+    src = open_source(source, source_opts)
     dst = connect_access(dest)
     if not state_path:
         state_path = os.path.join(os.path.dirname(script_path), 'sync-state.json')
     state = load_state(state_path)
+    failed_tables: List[str] = []
     try:
         for table in tables:
-            key_col = "id"
             log_info(f"=== Syncing table [{table}] ===")
+            flt = (table_filters or {}).get(table.lower()) or {}
+            where: Optional[str] = flt.get("where") or None
+            projection: List[str] = list(flt.get("columns") or [])
+            if where and isinstance(src, FileSource):
+                # Never turn a scoped run into an unscoped write of the whole file
+                raise ValueError("--where cannot be pushed into a file source")
+            if where:
+                log_info(f"  Row filter: {where}")
 
             # Columns intersection
-            src_cols_meta = get_columns(src, table)
+            if isinstance(src, FileSource):
+                src_cols_meta = src.columns()
+            else:
+                src_cols_meta = get_columns(src, table)
             dst_cols_meta = get_columns(dst, table)
             if not dst_cols_meta or not src_cols_meta:
                 continue
             dst_cols = [c for c, _ in dst_cols_meta]
             src_cols = [c for c, _ in src_cols_meta]
-            common = [c for c in dst_cols if c in src_cols]
+            try:
+                common = plan_columns(src_cols, dst_cols, key_col, projection)
+            except ValueError as e:
+                # Skip the table (and its resume state) rather than write a broken projection
+                sys.stderr.write(f"[ERR] {table}: {e} - skipping.\n")
+                failed_tables.append(table)
+                continue
             if not common:
                 log_info("  No matching columns - skipping.")
                 continue
@@ -373,21 +594,45 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
 
             # Detect natural keys and prebuild index in destination
             nk_combos = detect_natural_keys(table, dst_cols)
+            if projection:
+                # A natural key is only usable when all its columns are fetched
+                nk_combos = [combo for combo in nk_combos if all(c in common for c in combo)]
             if nk_combos:
                 nk_str = " OR ".join("(" + ", ".join(c) + ")" for c in nk_combos)
                 log_info(f"  Natural keys: {nk_str}")
-            dest_ids, nk_index = build_dest_nk_index(dst, table, key_col, nk_combos)
+            dest_ids, nk_index = build_dest_nk_index(dst, table, key_col, nk_combos, where)
 
             # Fetch all source rows with robust fallback
             fetch_cols = list(common)
-            try:
-                src_rows = fetch_all(src, table, fetch_cols)
-            except pyodbc.Error:
-                dropped = [c for c in fetch_cols if is_date_like(c)]
-                fetch_cols = [c for c in fetch_cols if c not in dropped]
-                if dropped:
-                    log_info("  Note: refetching without date-like columns: " + ", ".join(dropped))
-                src_rows = fetch_all(src, table, fetch_cols)
+            src_rows: Any
+            commit_every: Optional[int] = None
+            # only_keys narrows the source rows (targeted repair) through IN (...)
+            # batches of one query each; the natural key index stays scoped to
+            # the table filter alone.
+            table_keys = None if only_keys is None else (only_keys.get(table.lower()) or [])
+            fetch_wheres: List[Optional[str]] = [where]
+            if table_keys is not None:
+                fetch_wheres = []
+                for b in range(0, max(len(table_keys), 1), _REPAIR_BATCH):
+                    batch = table_keys[b:b + _REPAIR_BATCH]
+                    in_sql = f"{q(key_col)} IN ({', '.join(str(int(k)) for k in batch) or 'NULL'})"
+                    fetch_wheres.append(f"({where}) AND {in_sql}" if where else in_sql)
+            if isinstance(src, FileSource):
+                # Stream the file and commit per chunk to bound the Access transaction size
+                src_rows = src.iter_rows(fetch_cols)
+                if table_keys is not None:
+                    wanted_keys = set(table_keys)
+                    src_rows = (r for r in src_rows if int_key(r.get(key_col)) in wanted_keys)
+                commit_every = src.chunk_size
+            else:
+                try:
+                    src_rows = [r for w in fetch_wheres for r in fetch_all(src, table, fetch_cols, w)]
+                except pyodbc.Error:
+                    dropped = [c for c in fetch_cols if is_date_like(c)]
+                    fetch_cols = [c for c in fetch_cols if c not in dropped]
+                    if dropped:
+                        log_info("  Note: refetching without date-like columns: " + ", ".join(dropped))
+                    src_rows = [r for w in fetch_wheres for r in fetch_all(src, table, fetch_cols, w)]
             upd_cols = [c for c in fetch_cols if c.lower() != key_col.lower()]
             upd_set = ", ".join(f"{q(c)}=?" for c in upd_cols)
             ins_cols = list(fetch_cols)
@@ -398,10 +643,12 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
             cur = dst.cursor()
             inserted = 0
             updated = 0
-            # Resume state
+            processed = 0
+            # Resume state (kept separately for each filter/projection)
+            skey = state_key(table, where, common if projection else None)
             table_state = None
             try:
-                table_state = (state.get('tables', {}) if isinstance(state, dict) else {}).get(table)
+                table_state = (state.get('tables', {}) if isinstance(state, dict) else {}).get(skey)
             except Exception:
                 table_state = None
             last_numeric_key = None
@@ -421,6 +668,9 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                 # Transaction control is handled by the connection (autocommit=False).
                 # Access ODBC does not accept explicit BEGIN TRANSACTION here.
                 for row in src_rows:
+                    if commit_every and processed and processed % commit_every == 0:
+                        dst.commit()
+                    processed += 1
                     raw_id = row.get(key_col)
                     # Skip already processed rows if resume enabled
                     if resume and last_numeric_key is not None:
@@ -549,9 +799,9 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                 log_info(f"  Updated {updated} row(s), inserted {inserted} row(s).")
                 # Optional second-pass: fix date-like columns for TaxesSup by fetching as text and parsing safely
                 try:
-                    if table.lower() == 'taxessup':
+                    if table.lower() == 'taxessup' and not isinstance(src, FileSource):
                         # Determine date-like columns present in destination
-                        date_cols = [c for c in dst_cols if is_date_like(c)]
+                        date_cols = [c for c in dst_cols if is_date_like(c) and (not projection or c in common)]
                         if date_cols:
                             log_info("  Post-pass: normalising dates for TaxesSup")
                             total_scanned = 0
@@ -562,8 +812,13 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                                 # First fetch only ids with valid dates for this column
                                 src_cur_ids = src.cursor()
                                 try:
-                                    src_cur_ids.execute(f"SELECT {q('id')} FROM {q(table)} WHERE IsDate({q(dc)})")
-                                    id_rows = src_cur_ids.fetchall()
+                                    id_rows = []
+                                    for fw in fetch_wheres:
+                                        src_cur_ids.execute(
+                                            f"SELECT {q('id')} FROM {q(table)} WHERE IsDate({q(dc)})"
+                                            + (f" AND ({fw})" if fw else "")
+                                        )
+                                        id_rows.extend(src_cur_ids.fetchall())
                                 finally:
                                     try: src_cur_ids.close()
                                     except Exception: pass
@@ -622,7 +877,7 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                         pass
                 # Save resume state per table
                 try:
-                    if isinstance(state, dict):
+                    if save_progress and isinstance(state, dict):
                         troot = state.get('tables')
                         if not isinstance(troot, dict):
                             troot = {}
@@ -634,10 +889,15 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                             _updated_at = _now_utc.replace(microsecond=0).isoformat().replace('+00:00', 'Z')
                         except Exception:
                             _updated_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
-                        troot[table] = {
+                        entry: Dict[str, Any] = {
                             'lastNumericKey': int(max_numeric_seen) if isinstance(max_numeric_seen, int) else (max_numeric_seen if max_numeric_seen is not None else None),
                             'updatedAt': _updated_at,
                         }
+                        if where:
+                            entry['where'] = where
+                        if projection:
+                            entry['columns'] = list(common)
+                        troot[skey] = entry
                         if state_path:
                             save_state(state_path, state)
                 except Exception:
@@ -647,6 +907,9 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
                 raise
             finally:
                 cur.close()
+        if failed_tables:
+            log_info("Sync finished with errors in: " + ", ".join(failed_tables))
+            return 1
         log_info("Sync complete.")
         return 0
     finally:
@@ -660,12 +923,343 @@ def run_sync(source: str, dest: str, tables: List[str], resume: bool = False, st
             pass
 
 
-def parse_args(argv: List[str]) -> Tuple[str, str, List[str], bool, Optional[str]]:
+_VERIFY_FANOUT = 16
+_VERIFY_LEAF_SIZE = 64
+_REPAIR_BATCH = 500
+_NUM_TEXT_RE = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?$")
+
+
+def int_key(v: Any) -> Optional[int]:
+    if v is None or isinstance(v, bool):
+        return None
+    if isinstance(v, int):
+        return v
+    d = to_decimal(v)
+    return int(d) if d is not None and d == d.to_integral_value() else None
+
+
+def is_integer_value(v: Any) -> bool:
+    # Range verification needs keys the database orders numerically, so text
+    # such as '12' does not count even though int_key() would accept it.
+    if isinstance(v, bool) or not isinstance(v, (int, float, Decimal)):
+        return False
+    return int_key(v) is not None
+
+
+def to_decimal(v: Any) -> Optional[Decimal]:
+    # Exact numeric form: floats go through their shortest repr, text and
+    # Decimal are parsed as-is, so no precision is lost on large values.
+    try:
+        d = Decimal(repr(v)) if isinstance(v, float) else Decimal(str(v).strip())
+    except Exception:
+        return None
+    return d if d.is_finite() else None
+
+
+def canonical_value(v: Any) -> Any:
+    # Collapse driver-specific representations (Decimal vs float, 1.0 vs 1,
+    # datetime vs date, True vs 1, a TEXT column's '44' vs a file's 44) so
+    # equal values hash equally on both sides. Numbers are never rounded.
+    if v is None:
+        return None
+    if isinstance(v, (bool, int)):
+        return int(v)
+    if isinstance(v, str):
+        sv = v.strip()
+        if not _NUM_TEXT_RE.match(sv):
+            return v
+        v = Decimal(sv)
+    if isinstance(v, (float, Decimal)):
+        d = to_decimal(v)
+        if d is None:
+            return repr(v)
+        if d == d.to_integral_value():
+            return int(d)
+        return str(d.normalize())
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, (bytes, bytearray)):
+        return bytes(v).hex()
+    return str(v)
+
+
+def row_digest(key: int, row: Dict[str, Any], cols: List[str]) -> int:
+    parts = [key] + [canonical_value(sanitize_value(row.get(c), c)) for c in cols]
+    raw = json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+
+class DigestIndex:
+    """
+    Row digests of a file source, keyed by id. A file cannot answer range
+    queries, so it is read once and every range check is served from here.
+    """
+
+    def __init__(self, src: FileSource, cols: List[str], key_col: str) -> None:
+        value_cols = [c for c in cols if c.lower() != key_col.lower()]
+        self.digests: Dict[int, int] = {}
+        for row in src.iter_rows(cols):
+            raw = row.get(key_col)
+            if raw is None:
+                continue
+            if not is_integer_value(raw):
+                raise ValueError(f"key [{key_col}] is not an integer (e.g. {raw!r})")
+            k = int(raw)
+            self.digests[k] = row_digest(k, row, value_cols)
+        self.keys = sorted(self.digests)
+
+    def bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        return (self.keys[0], self.keys[-1]) if self.keys else (None, None)
+
+    def items(self, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+        for i in range(bisect.bisect_left(self.keys, lo), bisect.bisect_right(self.keys, hi)):
+            k = self.keys[i]
+            yield k, self.digests[k]
+
+
+def key_bounds(
+    side: Union[pyodbc.Connection, DigestIndex],
+    table: str,
+    key_col: str,
+    where: Optional[str] = None,
+) -> Tuple[Optional[int], Optional[int]]:
+    if isinstance(side, DigestIndex):
+        return side.bounds()
+    cur = side.cursor()
+    try:
+        cur.execute(f"SELECT MIN({q(key_col)}), MAX({q(key_col)}) FROM {q(table)}{where_clause(where)}")
+        r = cur.fetchone()
+    finally:
+        cur.close()
+    if not r or r[0] is None:
+        return None, None
+    for v in (r[0], r[1]):
+        if not is_integer_value(v):
+            raise ValueError(f"key [{key_col}] is not an integer (e.g. {v!r})")
+    return int(r[0]), int(r[1])
+
+
+def iter_range_digests(
+    side: Union[pyodbc.Connection, DigestIndex],
+    table: str,
+    cols: List[str],
+    key_col: str,
+    lo: int,
+    hi: int,
+    where: Optional[str] = None,
+) -> Iterator[Tuple[int, int]]:
+    if isinstance(side, DigestIndex):
+        for item in side.items(lo, hi):
+            yield item
+        return
+    value_cols = [c for c in cols if c.lower() != key_col.lower()]
+    rng = f"{q(key_col)} BETWEEN {int(lo)} AND {int(hi)}"
+    for row in fetch_all(side, table, cols, f"({where}) AND {rng}" if where else rng):
+        k = int_key(row.get(key_col))
+        if k is not None:
+            yield k, row_digest(k, row, value_cols)
+
+
+def range_checksums(
+    side: Union[pyodbc.Connection, DigestIndex],
+    table: str,
+    cols: List[str],
+    key_col: str,
+    lo: int,
+    hi: int,
+    step: int,
+    where: Optional[str] = None,
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Reads [lo, hi] once and returns {bucket: (row_count, digest_sum)} where
+    bucket i covers keys lo + i*step .. lo + (i+1)*step - 1. The digest sum is
+    order-independent, so both sides agree whenever their rows agree.
+    """
+    sums: Dict[int, Tuple[int, int]] = {}
+    for k, digest in iter_range_digests(side, table, cols, key_col, lo, hi, where):
+        b = (k - lo) // step
+        n, total = sums.get(b, (0, 0))
+        sums[b] = (n + 1, (total + digest) & 0xFFFFFFFFFFFFFFFF)
+    return sums
+
+
+def diff_ranges(
+    src: Union[pyodbc.Connection, DigestIndex],
+    dst: pyodbc.Connection,
+    table: str,
+    cols: List[str],
+    key_col: str,
+    lo: int,
+    hi: int,
+    where: Optional[str] = None,
+) -> Tuple[List[int], List[int], List[int], int]:
+    """
+    Merkle-style comparison of [lo, hi]: range checksums are computed on both
+    sides and only the sub-ranges whose checksums differ are split further,
+    down to ranges of _VERIFY_LEAF_SIZE keys where rows are compared per id.
+    Returns (missing_in_dest, only_in_dest, changed, ranges_read).
+    """
+    missing: List[int] = []
+    extra: List[int] = []
+    changed: List[int] = []
+    ranges_read = 0
+    pending = [(lo, hi)]
+    while pending:
+        a, b = pending.pop()
+        ranges_read += 1
+        if b - a + 1 <= _VERIFY_LEAF_SIZE:
+            s_dig = dict(iter_range_digests(src, table, cols, key_col, a, b, where))
+            d_dig = dict(iter_range_digests(dst, table, cols, key_col, a, b, where))
+            for k in sorted(set(s_dig) | set(d_dig)):
+                if k not in d_dig:
+                    missing.append(k)
+                elif k not in s_dig:
+                    extra.append(k)
+                elif s_dig[k] != d_dig[k]:
+                    changed.append(k)
+            continue
+        step = -(-(b - a + 1) // _VERIFY_FANOUT)
+        s_sums = range_checksums(src, table, cols, key_col, a, b, step, where)
+        d_sums = range_checksums(dst, table, cols, key_col, a, b, step, where)
+        for i in sorted(set(s_sums) | set(d_sums), reverse=True):
+            if s_sums.get(i) != d_sums.get(i):
+                pending.append((a + i * step, min(b, a + (i + 1) * step - 1)))
+    return sorted(missing), sorted(extra), sorted(changed), ranges_read
+
+
+def format_ids(ids: List[int], limit: int = 50) -> str:
+    shown = ", ".join(str(i) for i in ids[:limit])
+    return shown + (f" ... (+{len(ids) - limit})" if len(ids) > limit else "")
+
+
+def run_verify(
+    source: str,
+    dest: str,
+    tables: List[str],
+    key_col: str = "id",
+    source_opts: Optional[Dict[str, Any]] = None,
+    table_filters: Optional[Dict[str, Dict[str, Any]]] = None,
+    repair: bool = False,
+    state_path: Optional[str] = None,
+) -> int:
+    """
+    Returns 0 when every table agrees, 1 when differences were found or a
+    table could not be verified. With repair, the differing ids are re-synced
+    and the tables verified again; the code then reflects what remains.
+    """
+    log_info("[INFO] Vérification source / destination")
+    log_info(f"Source : {source}")
+    log_info(f"Destination : {dest}")
+    src = open_source(source, source_opts)
+    dst = connect_access(dest)
+    to_repair: Dict[str, List[int]] = {}
+    differs = False
+    try:
+        for table in tables:
+            log_info(f"=== Verifying table [{table}] ===")
+            flt = (table_filters or {}).get(table.lower()) or {}
+            where: Optional[str] = flt.get("where") or None
+            try:
+                if where and isinstance(src, FileSource):
+                    raise ValueError("--where cannot be pushed into a file source")
+                if isinstance(src, FileSource):
+                    src_cols_meta = src.columns()
+                else:
+                    src_cols_meta = get_columns(src, table)
+                dst_cols_meta = get_columns(dst, table)
+                common = plan_columns(
+                    [c for c, _ in src_cols_meta],
+                    [c for c, _ in dst_cols_meta],
+                    key_col,
+                    list(flt.get("columns") or []),
+                )
+                if key_col not in common:
+                    raise ValueError(f"key column [{key_col}] missing in common set")
+                src_side: Union[pyodbc.Connection, DigestIndex]
+                src_side = DigestIndex(src, common, key_col) if isinstance(src, FileSource) else src
+                s_lo, s_hi = key_bounds(src_side, table, key_col, where)
+                d_lo, d_hi = key_bounds(dst, table, key_col, where)
+                los = [k for k in (s_lo, d_lo) if k is not None]
+                his = [k for k in (s_hi, d_hi) if k is not None]
+                if not los or not his:
+                    log_info("  Both sides are empty.")
+                    continue
+                missing, extra, changed, ranges_read = diff_ranges(
+                    src_side, dst, table, common, key_col, min(los), max(his), where
+                )
+            except Exception as e:
+                # An unverified table must never read as a successful check
+                differs = True
+                sys.stderr.write(f"[WARN] Cannot verify {table} by range: {e}\n")
+                continue
+            log_info(f"  Compared {len(common)} column(s) over {key_col} {min(los)}..{max(his)}; read {ranges_read} range(s).")
+            if not (missing or extra or changed):
+                log_info("  OK - source and destination agree.")
+                continue
+            differs = True
+            if missing:
+                log_info(f"  Missing in destination ({len(missing)}): {format_ids(missing)}")
+            if changed:
+                log_info(f"  Different ({len(changed)}): {format_ids(changed)}")
+            if extra:
+                log_info(f"  Only in destination ({len(extra)}): {format_ids(extra)}")
+            if missing or changed:
+                to_repair[table] = missing + changed
+    finally:
+        try:
+            src.close()
+        except Exception:
+            pass
+        try:
+            dst.close()
+        except Exception:
+            pass
+
+    if not repair or not to_repair:
+        return 1 if differs else 0
+    # Targeted re-sync: only the differing ids, through the regular sync path,
+    # in a single run so connections and natural-key indexes are built once.
+    for table, ids in to_repair.items():
+        log_info(f"  Repairing {len(ids)} row(s) in [{table}]")
+    code = run_sync(
+        source, dest, list(to_repair),
+        state_path=state_path,
+        key_col=key_col,
+        source_opts=source_opts,
+        table_filters=table_filters,
+        save_progress=False,
+        only_keys={table.lower(): ids for table, ids in to_repair.items()},
+    )
+    log_info("=== Re-verifying after repair ===")
+    remaining = run_verify(
+        source, dest, tables,
+        key_col=key_col, source_opts=source_opts, table_filters=table_filters,
+    )
+    return 1 if code != 0 else remaining
+
+
+def parse_args(
+    argv: List[str],
+) -> Tuple[str, str, List[str], bool, Optional[str], str, Dict[str, Any], Dict[str, Dict[str, Any]], bool, bool]:
     source = ""
     dest = ""
     tables: List[str] = []
     resume = False
     state_path: Optional[str] = None
+    key_col = "id"
+    source_opts: Dict[str, Any] = {}
+    filters_path: Optional[str] = None
+    verify = False
+    repair = False
+    cli_filters: Dict[str, Dict[str, Any]] = {}
+
+    def split_table_arg(opt: str, raw: str) -> Tuple[str, str]:
+        # "Table:value" - only the first colon separates, the value may contain more
+        name, _, value = (raw or "").partition(":")
+        if not name.strip() or not value.strip():
+            sys.stderr.write(f"[ERR] {opt} expects TABLE:VALUE, got {raw!r}.\n")
+            sys.exit(1)
+        return name.strip().lower(), value.strip()
     it = iter(range(len(argv)))
     i = 0
     while i < len(argv):
@@ -681,23 +1275,107 @@ def parse_args(argv: List[str]) -> Tuple[str, str, List[str], bool, Optional[str
             i += 2; continue
         if a == "--resume":
             resume = True; i += 1; continue
+        if a == "--verify":
+            verify = True; i += 1; continue
+        if a == "--repair":
+            verify = True; repair = True; i += 1; continue
         if a in ("--state",) and i + 1 < len(argv):
             state_path = argv[i + 1]; i += 2; continue
+        if a == "--key" and i + 1 < len(argv):
+            key_col = (argv[i + 1] or "").strip() or key_col; i += 2; continue
+        if a == "--delimiter" and i + 1 < len(argv):
+            raw = argv[i + 1]
+            delim = "\t" if raw.lower() in ("tab", "\\t") else raw
+            if len(delim) != 1:
+                sys.stderr.write(f"[ERR] --delimiter must be a single character or 'tab', got {raw!r}.\n")
+                sys.exit(1)
+            source_opts["delimiter"] = delim
+            i += 2; continue
+        if a == "--encoding" and i + 1 < len(argv):
+            try:
+                codecs.lookup(argv[i + 1])
+            except LookupError:
+                sys.stderr.write(f"[ERR] --encoding: unknown codec {argv[i + 1]!r}.\n")
+                sys.exit(1)
+            source_opts["encoding"] = argv[i + 1]; i += 2; continue
+        if a == "--where" and i + 1 < len(argv):
+            name, value = split_table_arg(a, argv[i + 1])
+            cli_filters.setdefault(name, {})['where'] = value
+            i += 2; continue
+        if a == "--columns" and i + 1 < len(argv):
+            name, value = split_table_arg(a, argv[i + 1])
+            cli_filters.setdefault(name, {})['columns'] = [c.strip() for c in value.split(",") if c.strip()]
+            i += 2; continue
+        if a == "--filters" and i + 1 < len(argv):
+            filters_path = argv[i + 1]; i += 2; continue
+        if a == "--chunk-size" and i + 1 < len(argv):
+            try:
+                chunk_size = int(argv[i + 1])
+            except ValueError:
+                chunk_size = 0
+            if chunk_size <= 0:
+                sys.stderr.write(f"[ERR] --chunk-size must be a positive integer, got {argv[i + 1]!r}.\n")
+                sys.exit(1)
+            source_opts["chunk_size"] = chunk_size
+            i += 2; continue
         i += 1
     if not source or not dest:
-        sys.stderr.write("Usage: sync_cma.py --source <path> --dest <path> [--tables CSV]\n")
+        sys.stderr.write(
+            "Usage: sync_cma.py --source <path> --dest <path> [--tables CSV] [--key COL]"
+            " [--delimiter D] [--encoding ENC] [--chunk-size N]"
+            " [--where TABLE:EXPR] [--columns TABLE:COL,...] [--filters JSON] [--verify [--repair]]\n"
+        )
         sys.exit(1)
+    table_filters: Dict[str, Dict[str, Any]] = {}
+    if filters_path:
+        try:
+            table_filters = load_table_filters(filters_path)
+        except Exception as e:
+            sys.stderr.write(f"[ERR] Cannot read filter file {filters_path}: {e}\n")
+            sys.exit(1)
+    # Command-line entries override the filter file
+    for name, spec in cli_filters.items():
+        table_filters.setdefault(name, {}).update(spec)
+    if is_file_source(source):
+        # A file feeds exactly one destination table, named after the file by default
+        if not tables:
+            tables = [os.path.splitext(os.path.basename(source))[0]]
+        elif len(tables) > 1:
+            sys.stderr.write("[ERR] A file source can only be synced into a single table.\n")
+            sys.exit(1)
+        # Only the synced table matters; a shared filter file may scope others
+        if (table_filters.get(tables[0].lower()) or {}).get('where'):
+            sys.stderr.write("[ERR] --where is not supported with a file source (it cannot be pushed into SQL).\n")
+            sys.exit(1)
     if not tables:
         # Default tables to sync if none provided
         tables = [
             "Titres", "TypesTitres", "Detenteur", "coordonees", "TaxesSup", "DroitsEtabl"
         ]
-    return source, dest, tables, resume, state_path
+    # A command-line filter for a table that is not synced would be silently
+    # dropped and the intended table synced unfiltered
+    synced = {t.lower() for t in tables}
+    unknown = [name for name in cli_filters if name not in synced]
+    if unknown:
+        sys.stderr.write("[ERR] --where/--columns name table(s) not being synced: " + ", ".join(unknown) + "\n")
+        sys.exit(1)
+    return source, dest, tables, resume, state_path, key_col, source_opts, table_filters, verify, repair
 
 
 def main() -> None:
-    src, dst, tables, resume, state_path = parse_args(sys.argv[1:])
-    sys.exit(run_sync(src, dst, tables, resume=resume, state_path=state_path))
+    (src, dst, tables, resume, state_path, key_col, source_opts, table_filters,
+     verify, repair) = parse_args(sys.argv[1:])
+    if verify:
+        sys.exit(run_verify(
+            src, dst, tables,
+            key_col=key_col, source_opts=source_opts, table_filters=table_filters,
+            repair=repair, state_path=state_path,
+        ))
+    sys.exit(run_sync(
+        src, dst, tables,
+        resume=resume, state_path=state_path, key_col=key_col, source_opts=source_opts,
+        table_filters=table_filters,
+    ))
 
 
 if __name__ == "__main__":